@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+FlushFn = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class Batcher:
+    """
+    Coalesces concurrent single-item calls into one batched call.
+
+    Items submitted within max_delay_ms of the first queued item (or until
+    max_size distinct items are queued) are handed to flush_fn together.
+    flush_fn receives the de-duplicated list of items and returns a mapping
+    of item -> result. A result that is an exception is raised to every
+    caller that submitted that item; items missing from the mapping raise
+    KeyError.
+    """
+
+    def __init__(self, flush_fn: FlushFn, max_size: int = 500, max_delay_ms: int = 300):
+        self.flush_fn = flush_fn
+        self.max_size = max_size
+        self.max_delay = max_delay_ms / 1000
+        self._pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Hashable) -> Any:
+        """Queue an item for the next flush and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(item, []).append(future)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        # Keep a reference so the task is not garbage collected mid-flight
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Hashable, List[asyncio.Future]]) -> None:
+        try:
+            results = await self.flush_fn(list(batch))
+        except Exception as e:
+            results = {item: e for item in batch}
+
+        for item, futures in batch.items():
+            result = results[item] if item in results else KeyError(item)
+            for future in futures:
+                if future.done():
+                    # Caller was cancelled while waiting
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -1,13 +1,83 @@
-import boto3
+from contextlib import AsyncExitStack
+from functools import partial
+
+import aioboto3
+from aiobotocore.config import AioConfig
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from decouple import config
 
+from app.ratelimit import TokenBucket
 
-def get_ec2_client():
+# Upper bound on concurrent in-flight requests to EC2
+MAX_POOL_CONNECTIONS = 50
+
+EC2_CLIENT_CONFIG = AioConfig(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    connect_timeout=3,
+    read_timeout=20
+)
+
+# Matches the default EC2 refill rate for non-mutating API calls
+EC2_REQUEST_RATE = 20
+EC2_REQUEST_BURST = 20
+
+_ec2_client = None
+_rate_limiter = None
+_exit_stack = None
+
+
+async def open_ec2_client():
+    """
+    Open the process-wide async EC2 client.
+    Called once on application startup; the client is shared by all requests.
+    """
+    global _ec2_client, _rate_limiter, _exit_stack
+
+    if _ec2_client is not None:
+        return _ec2_client
+
+    session = aioboto3.Session(aws_access_key_id='ACCESS_KEY',
+                               aws_secret_access_key='SECRET_KEY',
+                               region_name='REGION')
+    exit_stack = AsyncExitStack()
     try:
-        return boto3.client('ec2',
-                            aws_access_key_id='ACCESS_KEY',
-                            aws_secret_access_key='SECRET_KEY',
-                            region_name='REGION')
+        _ec2_client = await exit_stack.enter_async_context(
+            session.client('ec2', config=EC2_CLIENT_CONFIG)
+        )
     except (NoCredentialsError, PartialCredentialsError):
+        await exit_stack.aclose()
         raise Exception("AWS credentials are not properly configured.")
+
+    # Built per client so its asyncio.Lock belongs to the loop the client runs on.
+    # Runs before request signing, so every outgoing EC2 request (retries included)
+    # is gated without touching call sites
+    _rate_limiter = TokenBucket(rate=EC2_REQUEST_RATE, capacity=EC2_REQUEST_BURST)
+    _ec2_client.meta.events.register_first(
+        'request-created.ec2', partial(_enforce_rate_limit, _rate_limiter)
+    )
+
+    _exit_stack = exit_stack
+    return _ec2_client
+
+
+async def _enforce_rate_limit(rate_limiter: TokenBucket, **kwargs):
+    await rate_limiter.acquire()
+
+
+async def close_ec2_client():
+    """Close the shared EC2 client on application shutdown"""
+    global _ec2_client, _rate_limiter, _exit_stack
+
+    if _exit_stack is not None:
+        await _exit_stack.aclose()
+    _ec2_client = None
+    _rate_limiter = None
+    _exit_stack = None
+
+
+def get_ec2_client():
+    """Return the shared EC2 client opened by open_ec2_client()"""
+    if _ec2_client is None:
+        raise RuntimeError("EC2 client is not open; call open_ec2_client() on startup.")
+    return _ec2_client
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Async token bucket rate limiter.
+
+    Holds up to capacity tokens and refills at rate tokens per second.
+    acquire() waits until a token is available, so bursts are bounded
+    client-side instead of relying on AWS throttling and retries.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait for and consume a single token"""
+        # Holding the lock while sleeping hands out tokens in FIFO order
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # Take the token up front; a negative balance is the debt this
+            # caller waits out, and the next refill pays it back
+            self._tokens -= 1
+            if self._tokens < 0:
+                await asyncio.sleep(-self._tokens / self.rate)
@@ -1,22 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional, Generator
-from datetime import datetime
+import hashlib
 
-from app.services import EC2Service
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from typing import Any, List, Optional
+from datetime import datetime, timezone
+
+from app.services import InstanceService
 from app.models import EC2InstanceRequest, EC2Instance
 
 
-def get_instance_service() -> Generator[EC2Service, None, None]:
+def get_instance_service(request: Request) -> InstanceService:
     """
-    Dependency provider for EC2Service.
-    Creates a new instance of EC2EC2Service for each request.
+    Dependency provider for InstanceService.
+    EC2Service holds no per-request state, so the app lifespan builds a single
+    instance bound to the open EC2 client and every request shares it.
+    Override via app.dependency_overrides in tests.
     """
-    service = EC2Service()
+    return request.app.state.ec2_service
 
-    try:
-        yield service
-    finally:
-        pass
+
+def _etag_matches(if_none_match: str, opaque_tag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an opaque tag (RFC 9110)"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == opaque_tag:
+            return True
+    return False
+
+
+def _conditional_response(request: Request, content: Any, etag_content: Any = None) -> Response:
+    """
+    Build an ORJSONResponse carrying an ETag, or a bare 304 if the client already has it.
+    etag_content lets callers exclude volatile fields (e.g. timestamps) from the ETag.
+    """
+    response = ORJSONResponse(content=content)
+    etag_body = response.body if etag_content is None else orjson.dumps(etag_content, option=orjson.OPT_SORT_KEYS)
+    opaque_tag = f'"{hashlib.blake2b(etag_body, digest_size=16).hexdigest()}"'
+
+    # Weak, because GZipMiddleware may re-encode the body under the same tag.
+    # no-cache: clients may store the response but must revalidate with If-None-Match
+    headers = {"ETag": f"W/{opaque_tag}", "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match", ""), opaque_tag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return response
 
 
 # Create router instance
@@ -39,7 +72,7 @@ router = APIRouter(
              )
 async def create_instance(
         request: EC2InstanceRequest,
-        service: EC2Service = Depends(get_instance_service)
+        service: InstanceService = Depends(get_instance_service)
 ) -> EC2Instance:
     """
     Create a new EC2 instance with the following parameters:
@@ -52,7 +85,7 @@ async def create_instance(
     - **environment**: Deployment environment (default: development)
     """
     try:
-        return service.create_instance(request)
+        return await service.create_instance(request)
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -66,10 +99,11 @@ async def create_instance(
             response_description="List of EC2 instances"
             )
 async def list_instances(
+        request: Request,
         environment: Optional[str] = Query(None, description="Filter by environment"),
         instance_type: Optional[str] = Query(None, description="Filter by instance type"),
-        service: EC2Service = Depends(get_instance_service)
-) -> List[EC2Instance]:
+        service: InstanceService = Depends(get_instance_service)
+) -> Response:
     """
     Retrieve a list of all EC2 instances.
 
@@ -77,15 +111,10 @@ async def list_instances(
     - **environment**: Filter instances by environment tag
     - **instance_type**: Filter instances by instance type
     """
-    instances = service.list_instances()
-
-    # Apply filters if provided
-    if environment:
-        instances = [i for i in instances if i.environment == environment]
-    if instance_type:
-        instances = [i for i in instances if i.instance_type == instance_type]
+    instances = await service.list_instances(environment, instance_type)
 
-    return instances
+    # Serialize directly with orjson instead of re-validating every item against response_model
+    return _conditional_response(request, [instance.model_dump(mode='json') for instance in instances])
 
 
 @router.get("/{instance_id}",
@@ -95,14 +124,16 @@ async def list_instances(
             )
 async def get_instance(
         instance_id: str,
-        service: EC2Service = Depends(get_instance_service)
+        no_cache: bool = Query(False, description="Bypass the short-lived instance cache"),
+        service: InstanceService = Depends(get_instance_service)
 ) -> EC2Instance:
     """
     Retrieve details for a specific EC2 instance by its ID.
 
     - **instance_id**: The ID of the EC2 instance to retrieve
+    - **no_cache**: Fetch fresh data from AWS instead of the instance cache
     """
-    return service.get_instance(instance_id)
+    return await service.get_instance(instance_id, no_cache=no_cache)
 
 
 @router.post("/{instance_id}/start",
@@ -112,14 +143,14 @@ async def get_instance(
              )
 async def start_instance(
         instance_id: str,
-        service: EC2Service = Depends(get_instance_service)
+        service: InstanceService = Depends(get_instance_service)
 ) -> EC2Instance:
     """
     Start a stopped EC2 instance.
 
     - **instance_id**: The ID of the EC2 instance to start
     """
-    return service.start_instance(instance_id)
+    return await service.start_instance(instance_id)
 
 
 @router.post("/{instance_id}/stop",
@@ -129,14 +160,14 @@ async def start_instance(
              )
 async def stop_instance(
         instance_id: str,
-        service: EC2Service = Depends(get_instance_service)
+        service: InstanceService = Depends(get_instance_service)
 ) -> EC2Instance:
     """
     Stop a running EC2 instance.
 
     - **instance_id**: The ID of the EC2 instance to stop
     """
-    return service.stop_instance(instance_id)
+    return await service.stop_instance(instance_id)
 
 
 @router.delete("/{instance_id}",
@@ -146,14 +177,14 @@ async def stop_instance(
                )
 async def terminate_instance(
         instance_id: str,
-        service: EC2Service = Depends(get_instance_service)
+        service: InstanceService = Depends(get_instance_service)
 ) -> EC2Instance:
     """
     Terminate an EC2 instance.
 
     - **instance_id**: The ID of the EC2 instance to terminate
     """
-    return service.terminate_instance(instance_id)
+    return await service.terminate_instance(instance_id)
 
 
 # Additional endpoints for enhanced functionality
@@ -163,23 +194,42 @@ async def terminate_instance(
             response_description="Summary of instance statuses"
             )
 async def get_status_summary(
-        service: EC2Service = Depends(get_instance_service)
-) -> dict:
+        request: Request,
+        environment: Optional[str] = Query(None, description="Filter by environment"),
+        instance_type: Optional[str] = Query(None, description="Filter by instance type"),
+        service: InstanceService = Depends(get_instance_service)
+) -> Response:
     """
     Get a summary of instance statuses across all instances.
-    """
-    instances = service.list_instances()
-    status_count = {}
 
-    for instance in instances:
-        status_count[instance.state] = status_count.get(instance.state, 0) + 1
+    Optional query parameters:
+    - **environment**: Filter instances by environment tag
+    - **instance_type**: Filter instances by instance type
+    """
+    status_count = await service.count_states(environment, instance_type)
 
-    return {
-        "total_instances": len(instances),
+    summary = {
+        "total_instances": sum(status_count.values()),
         "status_breakdown": status_count,
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.now(timezone.utc)
     }
 
+    # The timestamp changes on every call, so only the breakdown feeds the ETag
+    return _conditional_response(request, summary, etag_content=status_count)
+
+
+@router.post("/cache/clear",
+             summary="Clear the instance cache",
+             response_description="Number of cache entries removed"
+             )
+async def clear_instance_cache(
+        service: InstanceService = Depends(get_instance_service)
+) -> dict:
+    """
+    Drop all cached instance lookups so the next requests hit AWS.
+    """
+    return {"cleared_entries": service.clear_cache()}
+
 
 @router.post("/{instance_id}/tags",
              response_model=EC2Instance,
@@ -189,7 +239,7 @@ async def get_status_summary(
 async def update_instance_tags(
         instance_id: str,
         tags: dict,
-        service: EC2Service = Depends(get_instance_service)
+        service: InstanceService = Depends(get_instance_service)
 ) -> EC2Instance:
     """
     Update the tags of an EC2 instance.
@@ -1,55 +1,118 @@
-from typing import List, Optional
-from abc import ABC, abstractmethod
+import asyncio
+from collections import Counter
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Protocol
 from botocore.exceptions import ClientError
+from cachetools import TTLCache
 from fastapi import HTTPException
 
+from app.batcher import Batcher
 from app.models import EC2InstanceRequest, EC2Instance
-from app.config import get_ec2_client
+from app.config import MAX_POOL_CONNECTIONS, get_ec2_client
 
+# Instance IDs sent per API call; EC2 accepts at most 200 values per filter
+DESCRIBE_BATCH_SIZE = 200
+# Largest page describe_instances will return for an unfiltered listing
+DESCRIBE_PAGE_SIZE = 1000
+# Short-lived cache for repeated lookups of the same instance (e.g. status polling)
+INSTANCE_CACHE_SIZE = 10_000
+INSTANCE_CACHE_TTL = 3
+# Errors caused by a single bad ID in a batch; anything else (throttling,
+# permissions, ...) applies to the whole batch and is not retried per ID
+INSTANCE_ID_ERROR_CODES = frozenset({
+    'InvalidInstanceID.NotFound',
+    'InvalidInstanceID.Malformed',
+    'IncorrectInstanceState',
+})
 
-class InstanceService(ABC):
-    """Abstract base class for EC2 instance management"""
+# Bound once at import for the per-instance conversion hot path
+_construct_instance = EC2Instance.model_construct
 
-    @abstractmethod
-    def create_instance(self, instance_request: EC2InstanceRequest) -> EC2Instance:
+
+def _build_filters(environment: Optional[str] = None,
+                   instance_type: Optional[str] = None) -> List[dict]:
+    """Build describe_instances Filters so EC2 does the selection server-side"""
+    filters = []
+    if environment:
+        filters.append({'Name': 'tag:Environment', 'Values': [environment]})
+    if instance_type:
+        filters.append({'Name': 'instance-type', 'Values': [instance_type]})
+    return filters
+
+
+def _extract_state_changes(result_key: str, response: dict) -> Dict[str, dict]:
+    """Map a start/stop/terminate response to its state changes by instance ID"""
+    return {change['InstanceId']: change for change in response[result_key]}
+
+
+class InstanceService(Protocol):
+    """Structural interface for EC2 instance management"""
+
+    async def create_instance(self, instance_request: EC2InstanceRequest) -> EC2Instance:
         """Create a new EC2 instance"""
-        pass
+        ...
 
-    @abstractmethod
-    def get_instance(self, instance_id: str) -> EC2Instance:
+    async def get_instance(self, instance_id: str, no_cache: bool = False) -> EC2Instance:
         """Get information about a specific EC2 instance"""
-        pass
+        ...
 
-    @abstractmethod
-    def list_instances(self) -> List[EC2Instance]:
+    async def list_instances(self, environment: Optional[str] = None,
+                             instance_type: Optional[str] = None) -> List[EC2Instance]:
         """List all EC2 instances"""
-        pass
+        ...
+
+    async def count_states(self, environment: Optional[str] = None,
+                           instance_type: Optional[str] = None) -> Dict[str, int]:
+        """Count EC2 instances per state"""
+        ...
 
-    @abstractmethod
-    def start_instance(self, instance_id: str) -> EC2Instance:
+    def clear_cache(self) -> int:
+        """Drop cached instance lookups"""
+        ...
+
+    async def start_instance(self, instance_id: str) -> EC2Instance:
         """Start an EC2 instance"""
-        pass
+        ...
 
-    @abstractmethod
-    def stop_instance(self, instance_id: str) -> EC2Instance:
+    async def stop_instance(self, instance_id: str) -> EC2Instance:
         """Stop an EC2 instance"""
-        pass
+        ...
 
-    @abstractmethod
-    def terminate_instance(self, instance_id: str) -> EC2Instance:
+    async def terminate_instance(self, instance_id: str) -> EC2Instance:
         """Terminate an EC2 instance"""
-        pass
+        ...
 
 
-class EC2Service(InstanceService):
+class EC2Service:
     """Concrete implementation of InstanceService for AWS"""
 
     def __init__(self):
         self.ec2_client = get_ec2_client()
+        # Concurrent single-instance calls are coalesced into one API call
+        self._start_batcher = Batcher(partial(self._flush_batch, partial(
+            self._call_batch, self.ec2_client.start_instances,
+            partial(_extract_state_changes, 'StartingInstances')
+        )))
+        self._stop_batcher = Batcher(partial(self._flush_batch, partial(
+            self._call_batch, self.ec2_client.stop_instances,
+            partial(_extract_state_changes, 'StoppingInstances')
+        )))
+        self._terminate_batcher = Batcher(partial(self._flush_batch, partial(
+            self._call_batch, self.ec2_client.terminate_instances,
+            partial(_extract_state_changes, 'TerminatingInstances')
+        )))
+        self._describe_batcher = Batcher(
+            partial(self._flush_batch, self._describe_batch),
+            max_size=DESCRIBE_BATCH_SIZE
+        )
+        # Concurrent misses for the same ID are already coalesced by the describe batcher
+        self._instance_cache = TTLCache(maxsize=INSTANCE_CACHE_SIZE, ttl=INSTANCE_CACHE_TTL)
+        # Bounds batcher fan-out so it cannot exhaust the client's connection pool
+        self._call_semaphore = asyncio.Semaphore(MAX_POOL_CONNECTIONS)
 
-    def create_instance(self, instance_request: EC2InstanceRequest) -> EC2Instance:
+    async def create_instance(self, instance_request: EC2InstanceRequest) -> EC2Instance:
         try:
-            response = self.ec2_client.run_instances(
+            response = await self.ec2_client.run_instances(
                 ImageId=instance_request.ami_id,
                 InstanceType=instance_request.instance_type,
                 KeyName=instance_request.key_pair_name,
@@ -66,7 +129,7 @@ class EC2Service(InstanceService):
             )
 
             instance_id = response['Instances'][0]['InstanceId']
-            return self.get_instance(instance_id)
+            return await self.get_instance(instance_id)
 
         except ClientError as e:
             raise HTTPException(
@@ -74,37 +137,58 @@ class EC2Service(InstanceService):
                 detail=f"Failed to create instance: {str(e)}"
             )
 
-    def get_instance(self, instance_id: str) -> EC2Instance:
+    async def get_instance(self, instance_id: str, no_cache: bool = False) -> EC2Instance:
+        if not no_cache:
+            cached = self._instance_cache.get(instance_id)
+            if cached is not None:
+                return cached
+
         try:
-            response = self.ec2_client.describe_instances(
-                InstanceIds=[instance_id]
+            instance = await self._describe_batcher.submit(instance_id)
+        except KeyError:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Instance {instance_id} not found"
             )
-
-            if not response['Reservations']:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Instance {instance_id} not found"
-                )
-
-            instance = response['Reservations'][0]['Instances'][0]
-            return self._convert_to_ec2_instance(instance)
-
         except ClientError as e:
             raise HTTPException(
                 status_code=404,
                 detail=f"Failed to get instance {instance_id}: {str(e)}"
             )
 
-    def list_instances(self) -> List[EC2Instance]:
+        instance = self._convert_to_ec2_instance(instance)
+        self._instance_cache[instance_id] = instance
+        return instance
+
+    def clear_cache(self) -> int:
+        """Drop all cached instances, returning how many entries were removed"""
+        cleared = len(self._instance_cache)
+        self._instance_cache.clear()
+        return cleared
+
+    async def list_instances(self, environment: Optional[str] = None,
+                             instance_type: Optional[str] = None) -> List[EC2Instance]:
+        filters = _build_filters(environment, instance_type)
         try:
-            response = self.ec2_client.describe_instances()
-            instances = []
+            convert = self._convert_to_ec2_instance
+            return [convert(instance) async for instance in self._iter_instances(filters)]
 
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    instances.append(self._convert_to_ec2_instance(instance))
+        except ClientError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to list instances: {str(e)}"
+            )
 
-            return instances
+    async def count_states(self, environment: Optional[str] = None,
+                           instance_type: Optional[str] = None) -> Dict[str, int]:
+        """Count instances per state without building EC2Instance models"""
+        filters = _build_filters(environment, instance_type)
+        try:
+            status_count: Counter[str] = Counter()
+            async for state in self._iter_instances(filters, 'Reservations[].Instances[].State.Name'):
+                status_count[state] += 1
+
+            return dict(status_count)
 
         except ClientError as e:
             raise HTTPException(
@@ -112,10 +196,11 @@ class EC2Service(InstanceService):
                 detail=f"Failed to list instances: {str(e)}"
             )
 
-    def start_instance(self, instance_id: str) -> EC2Instance:
+    async def start_instance(self, instance_id: str) -> EC2Instance:
         try:
-            self.ec2_client.start_instances(InstanceIds=[instance_id])
-            return self.get_instance(instance_id)
+            await self._start_batcher.submit(instance_id)
+            self._instance_cache.pop(instance_id, None)
+            return await self.get_instance(instance_id)
 
         except ClientError as e:
             raise HTTPException(
@@ -123,10 +208,11 @@ class EC2Service(InstanceService):
                 detail=f"Failed to start instance {instance_id}: {str(e)}"
             )
 
-    def stop_instance(self, instance_id: str) -> EC2Instance:
+    async def stop_instance(self, instance_id: str) -> EC2Instance:
         try:
-            self.ec2_client.stop_instances(InstanceIds=[instance_id])
-            return self.get_instance(instance_id)
+            await self._stop_batcher.submit(instance_id)
+            self._instance_cache.pop(instance_id, None)
+            return await self.get_instance(instance_id)
 
         except ClientError as e:
             raise HTTPException(
@@ -134,10 +220,11 @@ class EC2Service(InstanceService):
                 detail=f"Failed to stop instance {instance_id}: {str(e)}"
             )
 
-    def terminate_instance(self, instance_id: str) -> EC2Instance:
+    async def terminate_instance(self, instance_id: str) -> EC2Instance:
         try:
-            self.ec2_client.terminate_instances(InstanceIds=[instance_id])
-            return self.get_instance(instance_id)
+            await self._terminate_batcher.submit(instance_id)
+            self._instance_cache.pop(instance_id, None)
+            return await self.get_instance(instance_id)
 
         except ClientError as e:
             raise HTTPException(
@@ -145,17 +232,81 @@ class EC2Service(InstanceService):
                 detail=f"Failed to terminate instance {instance_id}: {str(e)}"
             )
 
+    def _iter_instances(self, filters: Optional[List[dict]] = None,
+                        expression: str = 'Reservations[].Instances[]') -> AsyncIterator:
+        """
+        Yield results of a JMESPath expression across every page of describe_instances.
+        By default this flattens reservations into raw instance dicts.
+        """
+        paginator = self.ec2_client.get_paginator('describe_instances')
+        pages = paginator.paginate(
+            Filters=filters or [],
+            PaginationConfig={'PageSize': DESCRIBE_PAGE_SIZE}
+        )
+        return pages.search(expression)
+
+    async def _flush_batch(self, call_chunk: Callable[[List[str]], Awaitable[Dict[str, object]]],
+                           instance_ids: List[str]) -> Dict[str, object]:
+        """Split a flushed batch into chunks, call them concurrently and merge the results by ID"""
+        chunks = [
+            instance_ids[i:i + DESCRIBE_BATCH_SIZE]
+            for i in range(0, len(instance_ids), DESCRIBE_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(*(call_chunk(chunk) for chunk in chunks))
+        return {k: v for result in results for k, v in result.items()}
+
+    async def _describe_batch(self, instance_ids: List[str]) -> Dict[str, object]:
+        """
+        Describe a chunk of instances through an instance-id filter.
+        Unlike InstanceIds=, the filter never errors on unknown IDs; they are
+        simply absent from the result and surface as KeyError (404) to their caller.
+        """
+        filters = [{'Name': 'instance-id', 'Values': instance_ids}]
+        try:
+            async with self._call_semaphore:
+                return {instance['InstanceId']: instance async for instance in self._iter_instances(filters)}
+        except ClientError as e:
+            return {instance_id: e for instance_id in instance_ids}
+
+    async def _call_batch(self, api_call: Callable, extract: Callable[[dict], Dict[str, object]],
+                          instance_ids: List[str]) -> Dict[str, object]:
+        """Issue a single bounded-concurrency API call for a chunk of instance IDs"""
+        try:
+            async with self._call_semaphore:
+                response = await api_call(InstanceIds=instance_ids)
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code')
+            if len(instance_ids) == 1 or error_code not in INSTANCE_ID_ERROR_CODES:
+                return {instance_id: e for instance_id in instance_ids}
+            # One invalid ID fails the whole call, so retry individually
+            # to report the error only to the caller that submitted it
+            results = await asyncio.gather(*(
+                self._call_batch(api_call, extract, [instance_id])
+                for instance_id in instance_ids
+            ))
+            return {k: v for result in results for k, v in result.items()}
+
+        return extract(response)
+
     def _convert_to_ec2_instance(self, aws_instance: dict) -> EC2Instance:
         """Helper method to convert AWS instance response to EC2Instance model"""
-        tags = {tag['Key']: tag['Value'] for tag in aws_instance.get('Tags', [])}
+        get = aws_instance.get
+        name = environment = ''
+        for tag in get('Tags', ()):
+            key = tag['Key']
+            if key == 'Name':
+                name = tag['Value']
+            elif key == 'Environment':
+                environment = tag['Value']
 
-        return EC2Instance(
+        # AWS payloads are trusted, so skip pydantic validation
+        return _construct_instance(
             instance_id=aws_instance['InstanceId'],
             instance_type=aws_instance['InstanceType'],
             state=aws_instance['State']['Name'],
-            public_ip=aws_instance.get('PublicIpAddress', ''),
-            private_ip=aws_instance.get('PrivateIpAddress', ''),
-            name=tags.get('Name', ''),
-            environment=tags.get('Environment', ''),
+            public_ip=get('PublicIpAddress', ''),
+            private_ip=get('PrivateIpAddress', ''),
+            name=name,
+            environment=environment,
             launch_time=aws_instance['LaunchTime']
         )
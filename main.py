@@ -1,10 +1,32 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from app.config import open_ec2_client, close_ec2_client
 from app.routers import ec2
+from app.services import EC2Service, InstanceService
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_ec2_client()
+    # Built per lifespan so the service never outlives the client it is bound to
+    service: InstanceService = EC2Service()
+    app.state.ec2_service = service
+    yield
+    del app.state.ec2_service
+    await close_ec2_client()
+
 
 app = FastAPI(
     title="EC2 Instance Manager",
     description="API for managing AWS EC2 instances",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 app.include_router(ec2.router)
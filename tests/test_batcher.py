@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.batcher import Batcher
+
+
+class RecordingFlush:
+    """Flush function that records each batch and answers from a fixed mapping"""
+
+    def __init__(self, results=None):
+        self.results = results
+        self.batches = []
+
+    async def __call__(self, items):
+        self.batches.append(items)
+        if self.results is None:
+            return {item: f"result-{item}" for item in items}
+        return self.results
+
+
+def test_flushes_immediately_at_max_size():
+    flush = RecordingFlush()
+    batcher = Batcher(flush, max_size=3, max_delay_ms=60_000)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in ["a", "b", "c"])),
+            timeout=1
+        )
+
+    assert asyncio.run(run()) == ["result-a", "result-b", "result-c"]
+    assert flush.batches == [["a", "b", "c"]]
+
+
+def test_flushes_on_timer_below_max_size():
+    flush = RecordingFlush()
+    batcher = Batcher(flush, max_size=100, max_delay_ms=20)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+        return results, loop.time() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results == ["result-a", "result-b"]
+    assert flush.batches == [["a", "b"]]
+    assert elapsed >= 0.02
+
+
+def test_duplicate_items_share_one_result():
+    shared = object()
+    flush = RecordingFlush({"a": shared, "b": "other"})
+    batcher = Batcher(flush, max_delay_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), batcher.submit("a"))
+
+    first, second, third = asyncio.run(run())
+    assert flush.batches == [["a", "b"]]
+    assert first is shared and third is shared
+    assert second == "other"
+
+
+def test_exception_result_reaches_only_its_caller():
+    error = ValueError("bad item")
+    batcher = Batcher(RecordingFlush({"good": 1, "bad": error}), max_delay_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.submit("good"), batcher.submit("bad"), return_exceptions=True)
+
+    good, bad = asyncio.run(run())
+    assert good == 1
+    assert bad is error
+
+
+def test_missing_result_raises_key_error():
+    batcher = Batcher(RecordingFlush({"present": 1}), max_delay_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.submit("present"), batcher.submit("missing"), return_exceptions=True)
+
+    present, missing = asyncio.run(run())
+    assert present == 1
+    assert isinstance(missing, KeyError)
+
+
+def test_flush_failure_reaches_every_caller():
+    async def failing_flush(items):
+        raise RuntimeError("flush failed")
+
+    batcher = Batcher(failing_flush, max_delay_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelled_caller_is_skipped():
+    flush = RecordingFlush()
+    batcher = Batcher(flush, max_delay_ms=20)
+
+    async def run():
+        cancelled = asyncio.ensure_future(batcher.submit("a"))
+        waiting = asyncio.ensure_future(batcher.submit("a"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        # Without the skip, resolving the cancelled future first would abort the fan-out
+        assert await asyncio.wait_for(waiting, timeout=1) == "result-a"
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+    asyncio.run(run())
+    assert flush.batches == [["a"]]
@@ -0,0 +1,87 @@
+import asyncio
+from unittest import mock
+
+from app.ratelimit import TokenBucket
+
+
+class FakeClock:
+    """Monotonic clock that only advances when the bucket sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def run_with_clock(clock, coro_factory):
+    with mock.patch("app.ratelimit.time.monotonic", clock.monotonic), \
+            mock.patch("app.ratelimit.asyncio.sleep", clock.sleep):
+        bucket = TokenBucket(rate=10, capacity=5)
+        asyncio.run(coro_factory(bucket))
+
+
+def test_burst_up_to_capacity_does_not_wait():
+    clock = FakeClock()
+
+    async def run(bucket):
+        for _ in range(5):
+            await bucket.acquire()
+
+    run_with_clock(clock, run)
+    assert clock.sleeps == []
+    assert clock.now == 0
+
+
+def test_holds_rate_once_burst_is_spent():
+    clock = FakeClock()
+
+    async def run(bucket):
+        await asyncio.gather(*(bucket.acquire() for _ in range(25)))
+
+    run_with_clock(clock, run)
+    # 5 tokens from the burst, then 20 more at 10 tokens per second
+    assert abs(clock.now - 2.0) < 1e-9
+    assert len(clock.sleeps) == 20
+
+
+def test_refills_while_idle_up_to_capacity():
+    clock = FakeClock()
+
+    async def run(bucket):
+        for _ in range(5):
+            await bucket.acquire()
+        # Idle for far longer than a full refill; only capacity tokens come back
+        clock.now += 60
+        for _ in range(5):
+            await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+
+    run_with_clock(clock, run)
+    assert len(clock.sleeps) == 1
+    assert abs(clock.sleeps[0] - 0.1) < 1e-9
+
+
+def test_each_client_gets_a_bucket_bound_to_its_own_loop():
+    from app import config
+
+    async def burst_through_client():
+        await config.open_ec2_client()
+        try:
+            rate_limiter = config._rate_limiter
+            # More callers than the burst, so some of them wait on the lock
+            await asyncio.gather(*(config._enforce_rate_limit(rate_limiter) for _ in range(25)))
+            return rate_limiter
+        finally:
+            await config.close_ec2_client()
+
+    first = asyncio.run(burst_through_client())
+    second = asyncio.run(burst_through_client())
+    assert first is not second
+    assert config._rate_limiter is None
@@ -0,0 +1,96 @@
+import datetime
+from unittest import mock
+
+import pytest
+from dateutil.tz import tzutc
+from fastapi.testclient import TestClient
+
+from app.models import EC2Instance
+from app.routers.ec2 import get_instance_service
+from main import app
+
+
+class FakeService:
+    """Returns fixed data so responses (and their ETags) are stable across calls"""
+
+    async def list_instances(self, environment=None, instance_type=None):
+        return [
+            EC2Instance.model_construct(
+                instance_id="i-1", instance_type="t2.micro", state="running", public_ip="",
+                private_ip="", name="web", environment="production",
+                launch_time=datetime.datetime(2024, 1, 1, tzinfo=tzutc())
+            )
+        ]
+
+    async def count_states(self, environment=None, instance_type=None):
+        return {"running": 2, "stopped": 1}
+
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager, so the lifespan (and AWS client) never starts
+    app.dependency_overrides[get_instance_service] = FakeService
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(params=["/api/v1/instances/", "/api/v1/instances/status/summary"])
+def url(request):
+    return request.param
+
+
+def test_responses_carry_a_weak_etag(client, url):
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_list_keeps_pydantic_datetime_format(client):
+    assert client.get("/api/v1/instances/").json()[0]["launch_time"] == "2024-01-01T00:00:00Z"
+
+
+@pytest.mark.parametrize("make_header", [
+    lambda etag: etag,
+    lambda etag: etag[2:],
+    lambda etag: f'"stale", {etag}',
+    lambda etag: f'"stale",{etag[2:]}',
+    lambda etag: "*",
+], ids=["weak", "strong", "list", "list-no-space", "wildcard"])
+def test_matching_if_none_match_returns_bare_304(client, url, make_header):
+    etag = client.get(url).headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": make_header(etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+@pytest.mark.parametrize("header", ['"stale"', 'W/"stale", "other"'])
+def test_non_matching_if_none_match_returns_200(client, url, header):
+    response = client.get(url, headers={"If-None-Match": header})
+
+    assert response.status_code == 200
+    assert response.content
+
+
+def test_partial_tag_does_not_match(client, url):
+    etag = client.get(url).headers["etag"]
+
+    # A substring of the real tag must not count as a match
+    response = client.get(url, headers={"If-None-Match": etag[:-3] + '"'})
+
+    assert response.status_code == 200
+
+
+def test_summary_etag_ignores_timestamp(client):
+    timestamps = [datetime.datetime(2024, 1, 1, tzinfo=tzutc()), datetime.datetime(2024, 1, 2, tzinfo=tzutc())]
+    with mock.patch("app.routers.ec2.datetime") as fake_datetime:
+        fake_datetime.now.side_effect = timestamps
+        first = client.get("/api/v1/instances/status/summary")
+        second = client.get("/api/v1/instances/status/summary")
+
+    assert first.json()["timestamp"] != second.json()["timestamp"]
+    assert first.headers["etag"] == second.headers["etag"]
@@ -0,0 +1,240 @@
+import asyncio
+import datetime
+from unittest import mock
+
+import aioboto3
+import pytest
+from aiobotocore.stub import AioStubber
+from botocore.exceptions import ClientError
+from dateutil.tz import tzutc
+from fastapi import HTTPException
+
+from app.services import EC2Service
+
+LAUNCH_TIME = datetime.datetime(2024, 1, 1, tzinfo=tzutc())
+
+
+def aws_instance(instance_id, state="running"):
+    return {
+        "InstanceId": instance_id,
+        "InstanceType": "t2.micro",
+        "State": {"Name": state},
+        "LaunchTime": LAUNCH_TIME,
+    }
+
+
+def describe_params(instance_ids):
+    """Parameters of the filtered, paginated describe issued by the describe batcher"""
+    return {"Filters": [{"Name": "instance-id", "Values": instance_ids}], "MaxResults": 1000}
+
+
+def describe_response(*instances):
+    return {"Reservations": [{"Instances": list(instances)}]}
+
+
+class FakeStateChange:
+    """Stands in for start/stop/terminate_instances, failing any call that includes a bad ID"""
+
+    def __init__(self, result_key, error_code=None, bad_ids=()):
+        self.result_key = result_key
+        self.error_code = error_code
+        self.bad_ids = set(bad_ids)
+        self.calls = []
+
+    async def __call__(self, InstanceIds):
+        self.calls.append(list(InstanceIds))
+        if self.bad_ids.intersection(InstanceIds):
+            raise ClientError({"Error": {"Code": self.error_code, "Message": "failed"}}, "StartInstances")
+        return {self.result_key: [{"InstanceId": i} for i in InstanceIds]}
+
+
+def run_with_service(scenario, **client_overrides):
+    """
+    Run scenario(service, stubber) against an EC2Service wrapping a stubbed aiobotocore client.
+    client_overrides replace client methods (e.g. start_instances) before the service binds them.
+    """
+
+    async def run():
+        session = aioboto3.Session(aws_access_key_id="testing", aws_secret_access_key="testing",
+                                   region_name="us-east-1")
+        async with session.client("ec2") as client:
+            for name, method in client_overrides.items():
+                setattr(client, name, method)
+            with mock.patch("app.services.get_ec2_client", return_value=client):
+                service = EC2Service()
+            with AioStubber(client) as stubber:
+                await scenario(service, stubber)
+                stubber.assert_no_pending_responses()
+
+    asyncio.run(run())
+
+
+def test_concurrent_starts_share_one_call():
+    start = FakeStateChange("StartingInstances")
+
+    async def scenario(service, stubber):
+        stubber.add_response("describe_instances",
+                             describe_response(aws_instance("i-a", "pending"), aws_instance("i-b", "pending")),
+                             describe_params(["i-a", "i-b"]))
+
+        results = await asyncio.gather(service.start_instance("i-a"), service.start_instance("i-b"))
+        assert [r.state for r in results] == ["pending", "pending"]
+
+    run_with_service(scenario, start_instances=start)
+    assert start.calls == [["i-a", "i-b"]]
+
+
+def test_instance_id_error_is_retried_per_id_and_reaches_only_its_caller():
+    start = FakeStateChange("StartingInstances", "IncorrectInstanceState", bad_ids={"i-bad"})
+
+    async def scenario(service, stubber):
+        stubber.add_response("describe_instances",
+                             describe_response(aws_instance("i-a", "pending"), aws_instance("i-b", "pending")),
+                             describe_params(["i-a", "i-b"]))
+
+        results = await asyncio.gather(
+            service.start_instance("i-a"), service.start_instance("i-b"), service.start_instance("i-bad"),
+            return_exceptions=True
+        )
+        assert [r.instance_id for r in results[:2]] == ["i-a", "i-b"]
+        assert isinstance(results[2], HTTPException) and results[2].status_code == 400
+
+    run_with_service(scenario, start_instances=start)
+    assert start.calls == [["i-a", "i-b", "i-bad"], ["i-a"], ["i-b"], ["i-bad"]]
+
+
+def test_batch_wide_error_is_not_retried_per_id():
+    start = FakeStateChange("StartingInstances", "RequestLimitExceeded", bad_ids={"i-a"})
+
+    async def scenario(service, stubber):
+        results = await asyncio.gather(
+            service.start_instance("i-a"), service.start_instance("i-b"), return_exceptions=True
+        )
+        assert all(isinstance(r, HTTPException) and r.status_code == 400 for r in results)
+        assert all("RequestLimitExceeded" in r.detail for r in results)
+
+    run_with_service(scenario, start_instances=start)
+    assert start.calls == [["i-a", "i-b"]]
+
+
+def test_flush_is_split_into_chunks_of_200():
+    start = FakeStateChange("StartingInstances")
+    instance_ids = [f"i-{n}" for n in range(450)]
+
+    async def scenario(service, stubber):
+        results = await asyncio.gather(*(service._start_batcher.submit(i) for i in instance_ids))
+        assert [r["InstanceId"] for r in results] == instance_ids
+
+    run_with_service(scenario, start_instances=start)
+    assert sorted(len(call) for call in start.calls) == [50, 200, 200]
+    assert sorted(i for call in start.calls for i in call) == sorted(instance_ids)
+
+
+def test_concurrent_gets_share_one_filtered_describe():
+    instance_ids = [f"i-{n}" for n in range(100)]
+
+    async def scenario(service, stubber):
+        stubber.add_response("describe_instances",
+                             describe_response(*(aws_instance(i) for i in instance_ids)),
+                             describe_params(instance_ids))
+
+        results = await asyncio.gather(*(service.get_instance(i) for i in instance_ids))
+        assert [r.instance_id for r in results] == instance_ids
+
+    run_with_service(scenario)
+
+
+def test_unknown_id_is_a_404_without_extra_calls():
+    async def scenario(service, stubber):
+        # The instance-id filter simply omits unknown IDs; no per-ID fallback follows
+        stubber.add_response("describe_instances",
+                             describe_response(aws_instance("i-a"), aws_instance("i-b")),
+                             describe_params(["i-a", "i-typo", "i-b"]))
+
+        results = await asyncio.gather(
+            service.get_instance("i-a"), service.get_instance("i-typo"), service.get_instance("i-b"),
+            return_exceptions=True
+        )
+        assert results[0].instance_id == "i-a" and results[2].instance_id == "i-b"
+        assert isinstance(results[1], HTTPException) and results[1].status_code == 404
+        assert results[1].detail == "Instance i-typo not found"
+
+    run_with_service(scenario)
+
+
+def test_describe_error_reaches_every_caller_once():
+    async def scenario(service, stubber):
+        stubber.add_client_error("describe_instances", service_error_code="RequestLimitExceeded",
+                                 expected_params=describe_params(["i-a", "i-b"]))
+
+        results = await asyncio.gather(
+            service.get_instance("i-a"), service.get_instance("i-b"), return_exceptions=True
+        )
+        assert all(isinstance(r, HTTPException) and "RequestLimitExceeded" in r.detail for r in results)
+
+    run_with_service(scenario)
+
+
+def test_count_states_walks_every_page():
+    filters = [{"Name": "tag:Environment", "Values": ["production"]}]
+
+    async def scenario(service, stubber):
+        stubber.add_response("describe_instances",
+                             {**describe_response(aws_instance("i-1"), aws_instance("i-2", "stopped")),
+                              "NextToken": "page-2"},
+                             {"Filters": filters, "MaxResults": 1000})
+        stubber.add_response("describe_instances",
+                             describe_response(aws_instance("i-3")),
+                             {"Filters": filters, "MaxResults": 1000, "NextToken": "page-2"})
+
+        assert await service.count_states(environment="production") == {"running": 2, "stopped": 1}
+
+    run_with_service(scenario)
+
+
+def test_repeat_get_within_ttl_is_served_from_cache():
+    async def scenario(service, stubber):
+        stubber.add_response("describe_instances", describe_response(aws_instance("i-a")),
+                             describe_params(["i-a"]))
+
+        first = await service.get_instance("i-a")
+        # No second stubbed response: another describe would fail the stubber
+        assert await service.get_instance("i-a") is first
+
+    run_with_service(scenario)
+
+
+def test_no_cache_bypasses_the_cache():
+    async def scenario(service, stubber):
+        stubber.add_response("describe_instances", describe_response(aws_instance("i-a", "running")),
+                             describe_params(["i-a"]))
+        stubber.add_response("describe_instances", describe_response(aws_instance("i-a", "stopping")),
+                             describe_params(["i-a"]))
+
+        assert (await service.get_instance("i-a")).state == "running"
+        assert (await service.get_instance("i-a", no_cache=True)).state == "stopping"
+
+    run_with_service(scenario)
+
+
+@pytest.mark.parametrize("operation, result_key", [
+    ("start", "StartingInstances"),
+    ("stop", "StoppingInstances"),
+    ("terminate", "TerminatingInstances"),
+])
+def test_state_change_evicts_cache_before_follow_up_describe(operation, result_key):
+    state_change = FakeStateChange(result_key)
+
+    async def scenario(service, stubber):
+        stubber.add_response("describe_instances", describe_response(aws_instance("i-a", "cached")),
+                             describe_params(["i-a"]))
+        stubber.add_response("describe_instances", describe_response(aws_instance("i-a", "changed")),
+                             describe_params(["i-a"]))
+
+        assert (await service.get_instance("i-a")).state == "cached"
+        changed = await getattr(service, f"{operation}_instance")("i-a")
+        assert changed.state == "changed"
+        assert (await service.get_instance("i-a")).state == "changed"
+
+    run_with_service(scenario, **{f"{operation}_instances": state_change})
+    assert state_change.calls == [["i-a"]]